@@ -16,6 +16,41 @@ import subprocess
 import sys
 import argparse
 import time
+import threading
+import queue
+
+
+def wait_for_state_change(config, key, predicate, initial_delay=0.25, max_delay=10.0):
+    """
+    Block until predicate(config[key]) holds.
+
+    Instead of hammering the wandb API once a second we poll with
+    exponential backoff: start fast (the server might answer right away),
+    then slow down to max_delay while the job sits in the queue.
+    Whenever the value actually changes we reset to the fast interval,
+    so multi-step transitions are still picked up quickly.
+    """
+    delay = initial_delay
+    last_value = config[key]
+    while not predicate(config[key]):
+        time.sleep(delay)
+        config.update()
+        if config[key] != last_value:
+            last_value = config[key]
+            delay = initial_delay
+        else:
+            delay = min(delay * 1.5, max_delay)
+    return config[key]
+
+
+def drain_output(proc, lines):
+    """
+    Runs on a background thread: read the process output line by line
+    and feed it into a queue, so the main loop never blocks on process I/O.
+    """
+    for line in iter(proc.stdout.readline, b""):
+        lines.put(line)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -24,9 +59,9 @@ if __name__ == "__main__":
     parser.add_argument("--gres", default=1, type=int, help="Number of GPUs to request.")
     parser.add_argument("--time-limit", default=24, type=int, help="Number of hours to request.")
     args = parser.parse_args()
-    
+
     wandb.init(
-        project="tvg-slurm-lite", 
+        project="tvg-slurm-lite",
         job_type="slurm-lite-client",
         entity="tvg",
         config={
@@ -42,25 +77,49 @@ if __name__ == "__main__":
     print(f"Queued job: {wandb.run.id}")
 
     # Wait until the server assigns a node to this job.
-    while wandb.config.allocated_node is None:
-        time.sleep(1)
-        wandb.config.update()
+    wait_for_state_change(
+        wandb.config, "allocated_node",
+        lambda node: node is not None,
+    )
 
     # Run the script on the allocated node.
     cmd = [
-        "ssh", wandb.config.allocated_node, 
+        "ssh", wandb.config.allocated_node,
         f"CUDA_VISIBLE_DEVICES={wandb.config.allocated_gpus}",
         "bash", wandb.config.script_path
     ]
 
-    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT) as proc:
         # set the job state to running
         wandb.config.state = "running"
         wandb.config.update()
         print(f"Running process: {proc.pid} on node: {wandb.config.allocated_node}")
 
+        # drain process output on a background thread so that slow wandb
+        # round-trips never stall the pipe (and vice versa)
+        output_lines = queue.Queue()
+        reader = threading.Thread(target=drain_output, args=(proc, output_lines), daemon=True)
+        reader.start()
+
+        last_poll = 0.0
         while True:
+            # print whatever the process produced, waiting at most 1s for it
             try:
+                print(output_lines.get(timeout=1).decode(), end="")
+                while True:
+                    print(output_lines.get_nowait().decode(), end="")
+            except queue.Empty:
+                pass
+
+            if proc.poll() is not None:
+                break
+
+            # only hit the wandb control plane every 5s, the output draining
+            # above doesn't need to wait on it
+            if time.time() - last_poll > 5:
+                wandb.config.update()
+                last_poll = time.time()
+
                 # check if the process is set to be terminated
                 if wandb.config.state == "terminated":
                     print(f"Terminating process: {proc.pid} on node: {wandb.config.allocated_node}")
@@ -70,35 +129,17 @@ if __name__ == "__main__":
                         proc.kill()
                     break
 
-                output = proc.communicate(timeout=1)
-                print(output)
-                if proc.poll() is not None:
-                    break
-                time.sleep(1)
-            except subprocess.TimeoutExpired:
-                pass
+        # the reader thread may still be pumping the last buffered lines when
+        # the process exits; wait for it to hit EOF and flush the queue so
+        # the tail of the output (results, tracebacks) isn't lost
+        reader.join()
+        try:
+            while True:
+                print(output_lines.get_nowait().decode(), end="")
+        except queue.Empty:
+            pass
 
         # set the job state to finished
         wandb.config.state = "finished"
         wandb.config.update()
         print(f"Finished job: {wandb.run.id}")
-
-
-        
-
-
-        
-
-        
-
-
-
-
-
-
-
-
-
-
-
-
@@ -14,41 +14,90 @@ The server uses the wandb API to track the queued jobs and the free resources.
 
 import wandb
 import argparse
+import json
 import time
-from deepcopy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
-def process_pending_job(job, resources):
+# one long-lived Api client: it keeps a requests.Session with connection
+# keepalive, so every call after the first reuses the TCP+TLS session
+# instead of paying a fresh handshake
+api = wandb.Api(timeout=30)
+
+# parsed job configs keyed by run id; each entry is [updated_at, config], so
+# a job that hasn't moved since we last saw it skips the re-parse entirely.
+# the server is a one-shot cron process, so the cache lives on disk between
+# invocations — otherwise it would die with the process and every tick
+# would start cold
+JOB_CACHE_PATH = "/tmp/slite-job-cache.json"
+
+
+def load_job_cache():
+    try:
+        with open(JOB_CACHE_PATH) as cache_file:
+            return json.load(cache_file)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_job_cache(active_ids):
     """
-    This function takes the pending jobs and the free gpus and assigns the jobs to the gpus.
+    Persist the config cache for the next invocation, keeping only the jobs
+    that are still in the active sets. This is what bounds the cache file:
+    finished jobs never show up in the filtered fetches again, so pruning
+    here is the only point that reliably sees them disappear.
     """
+    global _job_cache
+    _job_cache = {job_id: entry for job_id, entry in _job_cache.items() if job_id in active_ids}
+    with open(JOB_CACHE_PATH, "w") as cache_file:
+        json.dump(_job_cache, cache_file)
 
-    # get the free gpus
-    free_gpu_ids = deepcopy(resources.summary.free_gpu_ids)
 
-    # get the user name
-    user = job.config["user"]
-    
-    # find a node that has enough free gpus
+_job_cache = load_job_cache()
+
+
+def job_config(job):
+    """
+    Return the parsed config dict for a job, reusing the cached copy as long
+    as the job's updatedAt hasn't changed.
+    """
+    # stringify the timestamp so it round-trips through the json cache
+    stamp = str(job.updated_at)
+    cached = _job_cache.get(job.id)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    config = dict(job.config)
+    _job_cache[job.id] = [stamp, config]
+    return config
+
+
+def process_pending_job(job, free_gpu_ids, dirty):
+    """
+    This function takes one pending job and assigns it to a node with enough free gpus.
+
+    free_gpu_ids is mutated in place; the caller owns the snapshot and
+    pushes it back to wandb once the whole batch is processed. Mutated
+    jobs are appended to dirty instead of being updated one by one.
+    """
+
+    config = job_config(job)
+    # the client stores the gpu request under "gres"
+    gres = config["gres"]
+
+    # find a node that has enough free gpus and claim them in one go
     allocated_node = None
     allocated_gpu_ids = None
     for node in free_gpu_ids:
-        if len(free_gpu_ids[node]) >= job.config["gres"]:
+        pool = free_gpu_ids[node]
+        if len(pool) >= gres:
+            allocated_gpu_ids, free_gpu_ids[node] = pool[:gres], pool[gres:]
             allocated_node = node
-            allocated_gpu_ids = free_gpu_ids[node][:job.config["gpus"]]
             break
 
     # if no node has enough free gpus, then continue
     if allocated_node is None:
         return
 
-
-    # remove the allocated gpus from the free gpus
-    free_gpu_ids[allocated_node] = free_gpu_ids[allocated_node][job.config["gpus"]:]
-    # update the free gpus
-    resources.summary.free_gpu_ids = free_gpu_ids
-    # update the resources
-    resources.update()
-
     # update the job with the allocated node
     job.config["allocated_node"] = allocated_node
     # update the job with the gpu id
@@ -57,11 +106,11 @@ def process_pending_job(job, resources):
     job.config["start_time"] = time.time()
     # update the job state
     job.state = "configuring"
-    # update the job with the new state
-    job.update()
+    # queue the job for the end-of-tick flush
+    dirty.append(job)
 
 
-def process_pending_jobs(job_list, resources):
+def process_pending_jobs(job_list, resources, free_gpu_ids, dirty):
     """
     This function ranks the pending jobs based on:
         (1) gpu requirement
@@ -69,16 +118,18 @@ def process_pending_jobs(job_list, resources):
     Then it processes the jobs in order.
     """
 
-    gpu_per_user = deepcopy(resources.summary.gpu_per_user)
+    # values are plain counts, a shallow copy is all we need
+    gpu_per_user = dict(resources.summary.gpu_per_user)
 
-    job_list.sort(key=lambda x: gpu_per_user[x.config["user"]], reverse=True)
-    job_list.sort(key=lambda x: x.config["gres"], reverse=True)
+    # single pass: primary key is the gpu requirement, ties are broken
+    # by how many gpus the user already holds
+    job_list.sort(key=lambda x: (-job_config(x)["gres"], -gpu_per_user[job_config(x)["user"]]))
 
     for job in job_list:
-        process_pending_job(job, resources)
+        process_pending_job(job, free_gpu_ids, dirty)
 
 
-def process_running_job(job, resources):
+def process_running_job(job, free_gpu_ids, dirty):
     """
     This function takes the running jobs and the gpu log and checks if the job is still running.
     If the job is not running anymore, then it frees up the gpus.
@@ -86,20 +137,19 @@ def process_running_job(job, resources):
     If the job is still running, but the time limit is exceeded, then it kills the job.
     """
 
-    # get the free gpus
-    free_gpu_ids = deepcopy(resources.summary.free_gpu_ids)
+    config = job_config(job)
 
     # get the allocated node
-    allocated_node = job.config["allocated_node"]
+    allocated_node = config["allocated_node"]
     # get the allocated gpus
-    allocated_gpu_ids = job.config["allocated_gpu_ids"]
+    allocated_gpu_ids = config["allocated_gpu_ids"]
 
     # check if the job is still running
     if job.state == "running":
         # check the running time of the job
-        if job.config["time_limit"] < time.time() - job.config["start_time"]:
+        if config["time_limit"] < time.time() - config["start_time"]:
             job.state = "terminated"
-            job.update()
+            dirty.append(job)
             # the job is terminated, but we wait for the client to kill the job
             # as only the client process has the privileges to kill the job
             return
@@ -107,24 +157,20 @@ def process_running_job(job, resources):
     if job.state == "finished":
         # if the job is not running anymore, then free up the gpus
         free_gpu_ids[allocated_node] = free_gpu_ids[allocated_node] + allocated_gpu_ids
-        # update the free gpus
-        resources.summary.free_gpu_ids = free_gpu_ids
-        # update the resources
-        resources.update()
 
         # update the job state
         job.state = "finished"
-        # update the job with the new state
-        job.update()
+        # queue the job for the end-of-tick flush
+        dirty.append(job)
 
-def process_running_jobs(job_list, resources):
+def process_running_jobs(job_list, free_gpu_ids, dirty):
     """
     This function checks the running jobs and:
         (1) sends out the kill signal to the client if the time limit is exceeded
         (2) frees up the gpu log if the job is finished
     """
     for job in job_list:
-        process_running_job(job, resources)
+        process_running_job(job, free_gpu_ids, dirty)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='SLURM Lite Server')
@@ -133,25 +179,75 @@ if __name__ == '__main__':
     args = parser.parse_args()
 
 
-    # scan all the runs in the 
-    jobs = wandb.Api().runs(args.jobs_project)
-    resources = wandb.Api().runs(args.resource_run)
+    resources = api.runs(args.resource_run)
+
+    # if-modified-since style guard: skip the whole sweep when no job moved
+    # since the last tick. This is only safe when the previous tick left
+    # nothing pending and nothing running: free_gpu_ids is overwritten by
+    # the torrnode monitor from gpustat, so gpus can free up (external
+    # processes exiting) without anything in the jobs project being touched
+    # — a leftover pending job must be retried every tick — and the time
+    # limit of a running job is enforced purely off the server's clock, so
+    # a runaway job past its deadline bumps nothing on the wandb side either.
+    tick_started = datetime.now(timezone.utc).isoformat()
+    last_tick = resources.summary.get("last_tick")
+    last_pending = resources.summary.get("pending_count", 0)
+    last_running = resources.summary.get("running_count", 0)
+    if last_tick is not None and last_pending == 0 and last_running == 0:
+        changed_jobs = api.runs(
+            args.jobs_project,
+            filters={"updatedAt": {"$gt": last_tick}},
+            per_page=1,
+        )
+        if len(changed_jobs) == 0:
+            exit(0)
+
+    # scan only the runs we care about: push the state filter into the
+    # wandb query so finished historical runs never leave the backend
+    pending_jobs = list(api.runs(
+        args.jobs_project,
+        filters={"state": "pending"},
+        per_page=500,
+    ))
+    # materialized because the tick walks it twice: once to process, once
+    # to count what's still running for the next tick's guard
+    running_jobs = list(api.runs(
+        args.jobs_project,
+        filters={"state": "running"},
+        per_page=500,
+    ))
+
+    # all mutated jobs get collected here and flushed in parallel at the end
+    dirty = []
+
+    # one snapshot of the free gpus shared by the whole tick; the values are
+    # flat lists of gpu ids, so a one-level copy is enough
+    free_gpu_ids = {node: list(gpus) for node, gpus in resources.summary.free_gpu_ids.items()}
+
+    # process the running jobs first, so gpus freed by finished jobs are
+    # already available to the pending sweep below
+    process_running_jobs(running_jobs, free_gpu_ids, dirty)
 
-    gpu_per_user = {}
-    free_gpu_ids = deepcopy(resources.summary["free_gpu_ids"])
-
-
-    # select the runs that are pending
-    pending_jobs = [job for job in jobs if job.state == "pending"]
+    # process the pending jobs
+    process_pending_jobs(pending_jobs, resources, free_gpu_ids, dirty)
 
-    # select the runs that are running
-    running_jobs = [job for job in jobs if job.state == "running"]
+    # one resources write per tick, no matter how many jobs touched it;
+    # remember how many jobs are still waiting or running so the next tick
+    # knows whether the skip-guard above is safe to take
+    resources.summary.free_gpu_ids = free_gpu_ids
+    resources.summary["last_tick"] = tick_started
+    resources.summary["pending_count"] = sum(1 for job in pending_jobs if job.state == "pending")
+    resources.summary["running_count"] = sum(1 for job in running_jobs if job.state == "running")
+    resources.update()
 
-    # process the pending jobs
-    process_pending_jobs(pending_jobs, resources)
+    # the job updates are independent PUTs, flush them in parallel
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(lambda job: job.update(), dirty))
 
-    # process the running jobs
-    process_running_jobs(running_jobs, resources)
+    # persist the config cache for the next invocation, pruned to the jobs
+    # that are still alive
+    active_ids = {job.id for job in pending_jobs} | {job.id for job in running_jobs}
+    save_job_cache(active_ids)
 
     
 
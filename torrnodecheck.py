@@ -1,4 +1,4 @@
-""" 
+"""
 monitor the availability of torrnode[1-15]
 for TVG internal use only
 written by Csabi
@@ -35,16 +35,18 @@ for some reason /homes and /oldhomes is segmented into ./53 and ./55
 but luckily they are mounted on the same drive, so we will stick to ./53
 """
 
-import wandb 
-import subprocess 
-import argparse 
-from collections import Counter 
+import wandb
+import subprocess
+import argparse
+import asyncio
+import asyncssh
+from collections import Counter
 import time
 import json
 import logging
 
-parser = argparse.ArgumentParser() 
-parser.add_argument("--resume-run-id", type=str) 
+parser = argparse.ArgumentParser()
+parser.add_argument("--resume-run-id", type=str)
 parser.add_argument("--io-time-delta", type=int, default=1800)
 parser.add_argument("--df-time-delta", type=int, default=3600)
 parser.add_argument("--gpu-time-delta", type=int, default=60)
@@ -92,7 +94,82 @@ reference_user = "csbotos"
 SHARED_MOUNTPOINTS = [mountpoint + "/" + reference_user for mountpoint in SHARED_MOUNTPOINTS]
 LOCAL_MOUNTPOINTS = [mountpoint + "/" + reference_user for mountpoint in LOCAL_MOUNTPOINTS]
 
-def gather_gpu_info(tn_users):
+# one persistent asyncssh connection per node, opened lazily on first use;
+# the handshake is paid once and every later command rides the same channel.
+# the cache holds the connect task rather than the connection, so concurrent
+# gatherers hitting the same node share a single handshake — and against a
+# dead node a single connect timeout — instead of queuing up their own
+conns = {}
+
+
+async def get_conn(node):
+    """
+    Return the cached ssh connection for a node, opening it on first use.
+    Every caller awaits the same connect task, so a fan-out of probes never
+    attempts (or times out on) more than one handshake per node.
+    """
+    task = conns.get(node)
+    if task is None:
+        logging.debug(f"Opening ssh connection to {node}")
+        task = asyncio.create_task(asyncio.wait_for(asyncssh.connect(node), args.timeout))
+        conns[node] = task
+    return await task
+
+
+def drop_conn(node):
+    """
+    Drop a node's cached connection and tear down its transport, so a dead
+    or timed-out session doesn't keep its socket and tasks alive on the
+    event loop. A failed connect attempt is dropped too, which lets the
+    next fan-out retry from scratch.
+    """
+    task = conns.pop(node, None)
+    if task is not None and task.done() and not task.cancelled() and task.exception() is None:
+        task.result().abort()
+
+
+async def _ssh_output(node, command):
+    """
+    Run a command on a node over the cached ssh connection and return its
+    output, or None if the node couldn't be reached in time. A timed-out or
+    broken connection is closed and dropped so the next call reopens it
+    cleanly.
+    """
+    logging.debug(f"Running command on {node}: {command}")
+    try:
+        conn = await get_conn(node)
+        result = await asyncio.wait_for(conn.run(command), args.timeout)
+    except (OSError, asyncssh.Error):
+        logging.warning(f"Couldn't connect to {node}")
+        drop_conn(node)
+        return None
+    except asyncio.TimeoutError:
+        logging.warning(f"Timed out connecting to {node}")
+        drop_conn(node)
+        return None
+
+    if result.exit_status != 0:
+        logging.warning(f"Command failed on {node}: {result.stderr}")
+        return None
+    logging.debug(f"Output: {result.stdout}")
+    return result.stdout
+
+
+async def _ssh_json(node, command):
+    """
+    Same as _ssh_output, but parse the output as JSON.
+    """
+    node_output = await _ssh_output(node, command)
+    if node_output is None:
+        return None
+    try:
+        return json.loads(node_output)
+    except json.JSONDecodeError:
+        logging.warning(f"Couldn't parse output from {node}")
+        return None
+
+
+async def gather_gpu_info(tn_users):
     """
     Using torrnode[1-15] check the number of GPUs being used by each user
 
@@ -101,19 +178,15 @@ def gather_gpu_info(tn_users):
     usage = Counter({user: 0 for user in tn_users})
     free_gpus = Counter({node: 0 for node in torrnodes})
     free_gpu_ids = {node: [] for node in torrnodes}
-    for node in torrnodes:
-        node_command = f"ssh {node} gpustat --json"
-        logging.debug(f"Running command: {node_command}")
-        try:
-            node_output = subprocess.check_output(node_command, shell=True, timeout=args.timeout).decode('utf-8')
-            logging.debug(f"Output: {node_output}")
-        except subprocess.CalledProcessError:
-            logging.warning(f"Couldn't connect to {node}")
-            continue
-        except subprocess.TimeoutExpired:
-            logging.warning(f"Timed out connecting to {node}")
+
+    # each query is independent network I/O, so fan out to all nodes at once
+    node_stats = await asyncio.gather(
+        *[_ssh_json(node, "gpustat --json") for node in torrnodes]
+    )
+
+    for node, stats in zip(torrnodes, node_stats):
+        if stats is None:
             continue
-        stats = json.loads(node_output)
         for gpu in stats["gpus"]:
             if gpu["processes"] is None:
                 logging.warning(f"Processes is None for {node} GPU {gpu['index']}")
@@ -133,214 +206,375 @@ def gather_gpu_info(tn_users):
     return usage, free_gpus, free_gpu_ids
 
 
-def gather_df_info(convert_to_gb=True):
+def run_clush_df(mountpoints):
+    """
+    Query df on every node in a single clustershell fan-out.
+
+    Returns a dict mapping node to {mountpoint: avail KB}, with zeros for
+    nodes that didn't answer properly, or None if clush itself failed
+    (e.g. not installed) so the caller can fall back to per-node ssh.
+    """
+    df_command = f"df {' '.join(mountpoints)} --output=avail | tail -n +2"
+    clush_command = f"clush -w {','.join(torrnodes)} '{df_command}'"
+    logging.debug(f"Running command: {clush_command}")
+    try:
+        clush_output = subprocess.check_output(clush_command, shell=True, timeout=args.timeout).decode('utf-8')
+        logging.debug(f"Output: {clush_output}")
+    except subprocess.CalledProcessError:
+        logging.warning("clush fan-out failed")
+        return None
+    except subprocess.TimeoutExpired:
+        logging.warning("clush fan-out timed out")
+        return None
+
+    # clush prefixes every output line with "nodename: "
+    per_node = {node: [] for node in torrnodes}
+    for line in clush_output.strip().split("\n"):
+        if ":" not in line:
+            continue
+        node, value = line.split(":", 1)
+        node = node.strip()
+        if node not in per_node:
+            continue
+        try:
+            per_node[node].append(int(value.strip()))
+        except ValueError:
+            logging.warning(f"Couldn't parse output from {node}")
+
+    free_space = {}
+    for node, values in per_node.items():
+        if len(values) != len(mountpoints):
+            logging.warning(f"{node} returned {len(values)} values, expected {len(mountpoints)}")
+            values = [0] * len(mountpoints)
+        free_space[node] = dict(zip(mountpoints, values))
+    return free_space
+
+
+async def gather_df_info(convert_to_gb=True):
     """
     Using torrnode8 as a default representative node, check the free space on each mountpoint
 
     Return a Counter mapping mountpoint to number of nodes with available free space
     """
 
-    def run_ssd_command(node, mountpoints):
+    async def run_ssd_command(node, mountpoints):
         free_space = {mountpoint: 0 for mountpoint in mountpoints}
 
         if node not in torrnodes:
             logging.warning(f"{node} is not a valid node")
             return free_space
-        
-        node_command = f"ssh {node} df {' '.join(mountpoints)} --output=avail | tail -n +2"
-        logging.debug(f"Running command: {node_command}")
+
+        node_output = await _ssh_output(node, f"df {' '.join(mountpoints)} --output=avail | tail -n +2")
+        if node_output is None:
+            return free_space
         try:
-            node_output = subprocess.check_output(node_command, shell=True, timeout=args.timeout).decode('utf-8').strip()
-            logging.debug(f"Output: {node_output}")
-            avail = node_output.split("\n")
+            avail = node_output.strip().split("\n")
             if len(avail) != len(mountpoints):
                 logging.warning(f"{node} returned {len(avail)} values, expected {len(mountpoints)}")
                 return free_space
             avail = [int(x) for x in avail]
-        except subprocess.CalledProcessError:
-            logging.warning(f"Couldn't connect to {node}")
-            return free_space
         except ValueError:
             logging.warning(f"Couldn't parse output from {node}")
             return free_space
-        except subprocess.TimeoutExpired:
-            logging.warning(f"Timed out connecting to {node}")
-            return free_space
 
         for i, mountpoint in enumerate(mountpoints):
             free_space[mountpoint] = avail[i]
         return free_space
-    
+
     # start with torrnode8, and exit as soon as we find a node that's responding
     for i in range(8, 16):
         free_space = Counter()
-        free_space.update(run_ssd_command(f"torrnode{i}", SHARED_MOUNTPOINTS))
+        free_space.update(await run_ssd_command(f"torrnode{i}", SHARED_MOUNTPOINTS))
         if len(free_space) != len(SHARED_MOUNTPOINTS):
             logging.warning(f"torrnode{i} returned {len(free_space)} values, expected {len(SHARED_MOUNTPOINTS)}")
             continue
         else:
             break
-    
+
     # if we get here, then we have a working node
-    # now we can query the rest of the nodes for local storage
-    for node in torrnodes:
+    # now we can query the rest of the nodes for local storage: one clush
+    # fan-out covers the whole fleet (run on a worker thread so it doesn't
+    # block the event loop), per-node ssh is only the fallback
+    clush_free_space = await asyncio.to_thread(run_clush_df, LOCAL_MOUNTPOINTS)
+    if clush_free_space is None:
+        local_results = await asyncio.gather(
+            *[run_ssd_command(node, LOCAL_MOUNTPOINTS) for node in torrnodes]
+        )
+        clush_free_space = dict(zip(torrnodes, local_results))
+
+    for node, local_free_space in clush_free_space.items():
         # update keys with the node id
-        local_free_space = run_ssd_command(node, LOCAL_MOUNTPOINTS)
         for mountpoint in local_free_space:
             free_space[f"{node}:{mountpoint}"] = local_free_space[mountpoint]
-    
-    # remove the reference user from the mountpoints
+
+    # strip the reference user from the keys and convert KB to GB in a single
+    # pass; the conversion uses 2^20 instead of 10^9 to match the output of
+    # df if -h was used... don't ask me why
+    scale = 1 / 2**20 if convert_to_gb else 1
+    suffix = f"/{reference_user}"
     free_space = {
-        mountpoint.replace(f"/{reference_user}", ""): free_space[mountpoint] 
-        for mountpoint in free_space
+        mountpoint.replace(suffix, ""): value * scale
+        for mountpoint, value in free_space.items()
     }
 
-    if convert_to_gb:
-        # assuming the output is in KB, convert to GB but with 2^20 instead of 10^9
-        # to match the output of df if -h was used... don't ask me why
-        free_space = {mountpoint: free_space[mountpoint] / 2**20 for mountpoint in free_space}
-
     logging.info("Result of query:")
     logging.info(free_space)
     return free_space
 
 
-def gather_io_info():
+async def gather_io_info():
     """
     Using torrnode[1-15] check the number of IO speed of each mountpoint
 
     Return a Counter mapping the mountpoint to the average IO speed
     """
-    def run_ssd_command(node, mountpoints, num_files=1e3):
+    async def probe_mountpoint(node, mountpoint, probe_size_mb=256):
+        """
+        Measure (read_speed, write_speed) on one mountpoint, in GB/s.
+
+        fio drives the disk through io_uring at queue depth 16, so the probe
+        saturates the device in a few seconds instead of dd's synchronous
+        1 GiB copy, and its JSON output needs no unit guessing.
+        Falls back to the dd probe on nodes without fio.
+        """
+        logging.debug(f"Checking IO times on {node}:{mountpoint}")
+        speeds = []
+        for rw in ("read", "write"):
+            fio_command = (
+                f"fio --name=probe --filename={mountpoint}/.test --size={probe_size_mb}M "
+                f"--bs=1M --ioengine=io_uring --iodepth=16 --rw={rw} "
+                f"--runtime=3 --time_based=0 --output-format=json"
+            )
+            stats = await _ssh_json(node, fio_command)
+            if stats is None:
+                # no fio on this node (or it misbehaved), use the old dd probe
+                return await probe_mountpoint_dd(node, mountpoint)
+            try:
+                bw_kib = stats["jobs"][0][rw]["bw"]
+            except (KeyError, IndexError):
+                logging.warning(f"Couldn't parse fio output from {node}")
+                return None
+            # fio reports KiB/s
+            speeds.append(bw_kib * 1024 / 1e9)
+
+        read_speed, write_speed = speeds
+        return read_speed, write_speed
+
+    async def probe_mountpoint_dd(node, mountpoint, num_files=100):
+        """
+        dd fallback probe: time the transfer on our side with a monotonic
+        clock instead of parsing dd's free-form human summary (which shifts
+        with locale and dd version), and use direct I/O so we measure the
+        device instead of the page cache.
+
+        100 MiB is plenty for a monitoring signal: direct I/O already gives
+        a stable number at this size, and unlike the old 1 GiB buffered
+        probe it neither takes minutes on a slow mount nor evicts a gig of
+        other tenants' data from the page cache every tick.
+        """
+        logging.debug(f"Checking IO times on {node}:{mountpoint} with dd")
+        num_files = int(num_files)
+        write_command = f"dd if=/dev/zero of={mountpoint}/.test bs=1M count={num_files} oflag=direct status=none"
+        read_command = f"dd if={mountpoint}/.test of=/dev/null bs=1M count={num_files} iflag=direct status=none"
+
+        # write first so the read always has a file to chew on
+        start = time.monotonic()
+        if await _ssh_output(node, write_command) is None:
+            return None
+        write_time = time.monotonic() - start
+
+        start = time.monotonic()
+        if await _ssh_output(node, read_command) is None:
+            return None
+        read_time = time.monotonic() - start
+        logging.debug(f"Read time: {read_time}, write time: {write_time}")
+
+        # bytes moved over wall time, in GB/s; the ssh round-trip is part of
+        # the measurement but it's amortized over the full transfer
+        num_bytes = num_files * 1024**2
+        read_speed = num_bytes / read_time / 1e9
+        write_speed = num_bytes / write_time / 1e9
+        return read_speed, write_speed
+
+    async def run_ssd_command(node, mountpoints):
         io_speed = {}
 
         if node not in torrnodes:
             logging.warning(f"{node} is not a valid node")
             return io_speed
-        
-        # since iostat doesn't function as expected, we'll use dd to get the speed
-
-        for mountpoint in mountpoints:
-            logging.debug(f"Checking IO times on {node}:{mountpoint}")
-            num_files = int(num_files)
-            write_command = f"ssh {node} dd if=/dev/zero of={mountpoint}/.test bs=1M count={num_files} 2>&1 | tail -n 1"
-            read_command = f"ssh {node} dd if={mountpoint}/.test of=/dev/null bs=1M count={num_files} 2>&1 | tail -n 1"
-            try:
-                logging.debug(f"Running command: {read_command}")
-                read_output = subprocess.check_output(read_command, shell=True, timeout=args.timeout).decode('utf-8').strip()
-                logging.debug(f"Output: {read_output}")
-
-                logging.debug(f"Running command: {write_command}")
-                write_output = subprocess.check_output(write_command, shell=True, timeout=args.timeout).decode('utf-8').strip()
-                logging.debug(f"Output: {write_output}")
-
-                # parse the output
-                # 1048576000 bytes (1.0 GB, 1000 MiB) copied, 0.889669 s, 1.2 GB/s
-                #                     We need to get this number ^
-                read_time = float(read_output.split(" ")[-4])
-                write_time = float(write_output.split(" ")[-4])
-                logging.debug(f"Read time: {read_time}, write time: {write_time}")
-                
-                # convert to GB/s...
-                # again with the conversion dd is not consistent, 
-                # they report both KiB and KB and GB but using 1GB 
-                # using 1/time to get the speed doesn't result in the same number
-                # as the one reported by dd (but it's close enough)
-                read_speed = 1 / read_time
-                write_speed = 1 / write_time
-
-            except subprocess.CalledProcessError:
-                logging.warning(f"Couldn't connect to {node}")
-                return io_speed
-            except ValueError:
-                logging.warning(f"Couldn't parse output from {node}")
-                return io_speed
-            except subprocess.TimeoutExpired:
-                logging.warning(f"Timed out connecting to {node}")
-                return io_speed
-            
-            io_speed[f"{node}:{mountpoint}"] = (read_speed, write_speed)
+
+        # since iostat doesn't function as expected, we'll use fio/dd to get
+        # the speed; the mountpoints live on distinct disks, so probe them
+        # all at once
+        speeds = await asyncio.gather(
+            *[probe_mountpoint(node, mountpoint) for mountpoint in mountpoints]
+        )
+
+        for mountpoint, speed in zip(mountpoints, speeds):
+            if speed is None:
+                continue
+            io_speed[f"{node}:{mountpoint}"] = speed
 
         return io_speed
-                    
+
 
     # start with torrnode8, and exit as soon as we find a node that's responding
     for i in range(8, 16):
         io_speeds = {}
-        io_speeds.update(run_ssd_command(f"torrnode{i}", SHARED_MOUNTPOINTS))
+        io_speeds.update(await run_ssd_command(f"torrnode{i}", SHARED_MOUNTPOINTS))
         if len(io_speeds) != len(SHARED_MOUNTPOINTS):
             logging.warning(f"torrnode{i} returned {len(io_speeds)} values, expected {len(SHARED_MOUNTPOINTS)}")
             continue
         else:
             break
-    
-    # if we get here, then we have a working node
-    # now we can query the rest of the nodes for local storage
-    for node in torrnodes:
-        io_speeds.update(run_ssd_command(node, LOCAL_MOUNTPOINTS))
-
-
-    # remove the reference user from the mountpoints
-    io_speeds = {
-        mountpoint.replace(f"/{reference_user}", ""): io_speeds[mountpoint]
-        for mountpoint in io_speeds
-    }
 
-    # split the read and write speeds
-    read_speeds = {mountpoint: io_speeds[mountpoint][0] for mountpoint in io_speeds}
-    write_speeds = {mountpoint: io_speeds[mountpoint][1] for mountpoint in io_speeds}
+    # if we get here, then we have a working node
+    # now we can query the rest of the nodes for local storage, in parallel
+    local_results = await asyncio.gather(
+        *[run_ssd_command(node, LOCAL_MOUNTPOINTS) for node in torrnodes]
+    )
+    for local_io_speeds in local_results:
+        io_speeds.update(local_io_speeds)
+
+
+    # strip the reference user from the keys and split the read and write
+    # speeds into their own dicts in a single pass
+    suffix = f"/{reference_user}"
+    read_speeds = {}
+    write_speeds = {}
+    for mountpoint, (read_speed, write_speed) in io_speeds.items():
+        mountpoint = mountpoint.replace(suffix, "")
+        read_speeds[mountpoint] = read_speed
+        write_speeds[mountpoint] = write_speed
 
     logging.info("Result of query:")
     logging.info(f"Read speeds: {read_speeds}")
     logging.info(f"Write speeds: {write_speeds}")
-    
+
     return read_speeds, write_speeds
 
-def check_state():
+# home dirs to enumerate users from, and where to cache the result
+USER_HOME_DIRS = ["/homes/53", "/homes/55", "/oldhomes/53", "/oldhomes/55"]
+USER_LIST_CACHE = "/tmp/slite-tn-users.json"
+
+
+async def list_tn_users():
+    """
+    List all the users that have a home directory on the cluster.
+
+    The four home listings are folded into a single ssh round-trip, and the
+    result is cached on disk: the user list barely ever changes, so a restart
+    shouldn't have to wait on torrnode8.
+    """
+    try:
+        with open(USER_LIST_CACHE) as cache_file:
+            tn_users = json.load(cache_file)
+        logging.info(f"Loaded {len(tn_users)} users from {USER_LIST_CACHE}")
+        return tn_users
+    except (OSError, json.JSONDecodeError):
+        pass
+
+    node_output = await _ssh_output("torrnode8", f"for d in {' '.join(USER_HOME_DIRS)}; do ls $d; done")
+    if node_output is None:
+        raise RuntimeError("Couldn't list the users through torrnode8")
+    # the same user can show up in several home dirs, so dedupe
+    tn_users = sorted(set(node_output.split("\n")) - {""})
+
+    with open(USER_LIST_CACHE, "w") as cache_file:
+        json.dump(tn_users, cache_file)
+    return tn_users
+
+
+async def check_state():
     """
     Check the state of all the nodes and return a dictionary mapping the node name to a boolean
     indicating if the node is online or not
     """
+    node_outputs = await asyncio.gather(
+        *[_ssh_output(node, "echo 'online'") for node in torrnodes]
+    )
+
     status = {}
-    for node in torrnodes:
-        try:
-            node_command = f"ssh {node} echo 'online'"
-            logging.debug(f"Running command: {node_command}")
-            node_output = subprocess.check_output(node_command, shell=True, timeout=args.timeout).decode('utf-8').strip()
-            logging.debug(f"Node {node} responded with {node_output}")
-            if node_output.strip() == "online":
-                status[node] = 1
-            else:
-                status[node] = 0
-        except subprocess.CalledProcessError:
+    for node, node_output in zip(torrnodes, node_outputs):
+        if node_output is not None and "online" in node_output:
+            status[node] = 1
+        else:
             status[node] = 0
-        except subprocess.TimeoutExpired:
-            logging.warning(f"Timed out connecting to {node}")
-            continue
-    
+
     logging.info("Node status:")
     logging.info(status)
     return status
 
 
-if __name__ == "__main__":
-    logging.basicConfig(format='%(asctime)s-[%(levelname)s]: %(message)s', level=logging.DEBUG)
+# per-metric relative tolerance for re-logging: free space moves slowly and
+# io numbers are noisy, so near-identical values are not worth a new history
+# row; 0.0 means log only on an actual transition, unlisted metrics always log
+LOG_TOLERANCE = {
+    "node_state": 0.0,
+    "free_space": 0.01,
+    "read_speeds": 0.10,
+    "write_speeds": 0.10,
+}
+
+# last value actually written to wandb.log, per metric
+_last_logged = {}
+
+
+def changed_enough(key, value):
+    """
+    Decide whether a metric moved enough since the last logged value to be
+    worth a new history row. Only wandb.log is gated by this, the summary
+    is always kept current.
+    """
+    if key not in LOG_TOLERANCE:
+        return True
+    previous = _last_logged.get(key)
+    if previous is None or set(value) != set(previous):
+        return True
+    tolerance = LOG_TOLERANCE[key]
+    if tolerance == 0.0:
+        return value != previous
+    return any(
+        abs(value[k] - previous[k]) > tolerance * max(abs(previous[k]), 1)
+        for k in value
+    )
+
+
+def log_metrics(payload):
+    """
+    Push one gatherer's results to wandb. Everything runs on the single
+    event-loop thread, so the calls are naturally serialized and the old
+    writer thread/queue is gone.
+    """
+    # the summary always tracks the latest values
+    for key, value in payload.items():
+        wandb.summary[key] = value
+    # the history only gets a new row when something actually moved
+    if any(changed_enough(key, value) for key, value in payload.items()):
+        wandb.log(payload)
+        for key, value in payload.items():
+            _last_logged[key] = value
+
+
+async def metric_loop(gather, time_delta):
+    """
+    Long-lived task for one gatherer: collect, log, sleep for the configured
+    cadence, repeat. Each metric runs as its own coroutine, so a slow probe
+    (e.g. a 90s IO check on a sick mountpoint) no longer delays the others
+    past their time delta.
+    """
+    while True:
+        try:
+            log_metrics(await gather())
+        except Exception:
+            logging.exception("Gatherer failed")
+        await asyncio.sleep(time_delta)
+
+
+async def main():
+    # list all the users in /homes and /oldhomes through torrnode8
+    tn_users = await list_tn_users()
 
-    # list all the users in /homes/53 and /homes/55 through torrnode8
-    node_command = f"ssh torrnode8 ls /homes/53"
-    node_output = subprocess.check_output(node_command, shell=True, timeout=args.timeout).decode('utf-8')
-    tn_users = node_output.split("\n")[:-1]
-    node_command = f"ssh torrnode8 ls /homes/55"
-    node_output = subprocess.check_output(node_command, shell=True, timeout=args.timeout).decode('utf-8')
-    tn_users += node_output.split("\n")[:-1]
-    node_command = f"ssh torrnode8 ls /oldhomes/53"
-    node_output = subprocess.check_output(node_command, shell=True, timeout=args.timeout).decode('utf-8')
-    tn_users += node_output.split("\n")[:-1]
-    node_command = f"ssh torrnode8 ls /oldhomes/55"
-    node_output = subprocess.check_output(node_command, shell=True, timeout=args.timeout).decode('utf-8')
-    tn_users += node_output.split("\n")[:-1]
-
-    
     # resume wandb session if it's already existing
     if args.resume_run_id is not None:
         print("Resuming run", args.resume_run_id)
@@ -350,64 +584,39 @@ if __name__ == "__main__":
             entity="csbotos",
             resume=True,
         )
-   
+
     else:
         wandb.init(
-            project="torrnode-monitor", 
+            project="torrnode-monitor",
             entity="csbotos",
         )
-    
+
     wandb.config.update({tn_user: True for tn_user in tn_users})
 
-    # track how much time passed since checking
-    last_io_time = 0
-    last_df_time = 0
-    last_gpu_time = 0
-    last_state_time = 0
+    # wrap each gatherer so it hands log_metrics a ready-to-log dict
+    async def gpu_metrics():
+        gpu_usage, free_gpus, free_gpu_ids = await gather_gpu_info(tn_users)
+        return {"gpu_usage": gpu_usage, "free_gpus": free_gpus, "free_gpu_ids": free_gpu_ids}
 
-    IO_TIME_DELTA = args.io_time_delta
-    DF_TIME_DELTA = args.df_time_delta
-    GPU_TIME_DELTA = args.gpu_time_delta
-    STATE_TIME_DELTA = args.state_time_delta
+    async def state_metrics():
+        return {"node_state": await check_state()}
 
-    while True:
-        try: 
-            # This should be done asynchronusly in the future
-            # but for now, we'll just do it sequentially
-
-            # check the GPU usage
-            if time.time() - last_gpu_time > GPU_TIME_DELTA:
-                gpu_usage, free_gpus, free_gpu_ids = gather_gpu_info(tn_users)
-                wandb.log({"gpu_usage": gpu_usage})
-                wandb.log({"free_gpus": free_gpus})
-                wandb.log({"free_gpu_ids": free_gpu_ids})
-                wandb.summary["gpu_usage"] = gpu_usage
-                wandb.summary["free_gpus"] = free_gpus
-                wandb.summary["free_gpu_ids"] = free_gpu_ids
-                last_gpu_time = time.time()
-
-            # check the state of the nodes
-            if time.time() - last_state_time > STATE_TIME_DELTA:
-                node_state = check_state()
-                wandb.log({"node_state": node_state})
-                wandb.summary["node_state"] = node_state
-                last_state_time = time.time()
-
-            # check the disk usage
-            if time.time() - last_df_time > DF_TIME_DELTA:
-                free_space = gather_df_info()
-                wandb.log({"free_space": free_space})
-                wandb.summary["free_space"] = free_space
-                last_df_time = time.time()
-
-            # check the IO speed
-            if time.time() - last_io_time > IO_TIME_DELTA:
-                read_speeds, write_speeds = gather_io_info()
-                wandb.log({"read_speeds": read_speeds, "write_speeds": write_speeds})
-                wandb.summary["read_speeds"] = read_speeds
-                wandb.summary["write_speeds"] = write_speeds
-                last_io_time = time.time()
-   
-        finally:
-            # sleep for a bit
-            time.sleep(10)
+    async def df_metrics():
+        return {"free_space": await gather_df_info()}
+
+    async def io_metrics():
+        read_speeds, write_speeds = await gather_io_info()
+        return {"read_speeds": read_speeds, "write_speeds": write_speeds}
+
+    # one task per metric, each respecting its own cadence
+    await asyncio.gather(
+        metric_loop(gpu_metrics, args.gpu_time_delta),
+        metric_loop(state_metrics, args.state_time_delta),
+        metric_loop(df_metrics, args.df_time_delta),
+        metric_loop(io_metrics, args.io_time_delta),
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s-[%(levelname)s]: %(message)s', level=logging.DEBUG)
+    asyncio.run(main())